@@ -1,18 +1,60 @@
+import asyncio
+import copy
 import anthropic
-from typing import List, Optional, Dict, Any
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import AsyncIterator, List, Optional, Dict, Any
+from semantic_cache import SemanticCache
+
+# Connection pool settings shared by every AIGenerator instance
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+HTTP_TIMEOUT = 60.0
+
+# SDK-level retries replay only the failing HTTP call (429/5xx) with exponential backoff and jitter
+MAX_RETRIES = 4
+
+# Bounded pool for blocking tool executions (vector store queries) on the async path
+TOOL_POOL_SIZE = 8
+_TOOL_POOL = ThreadPoolExecutor(max_workers=TOOL_POOL_SIZE, thread_name_prefix="tool")
+
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_shared_http_client() -> httpx.Client:
+    """Return the process-wide HTTP client so sync calls reuse keep-alive connections"""
+    global _http_client
+    if _http_client is None:
+        _http_client = anthropic.DefaultHttpxClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    return _http_client
+
+
+def get_shared_async_http_client() -> httpx.AsyncClient:
+    """Return the process-wide async HTTP client so async calls share one connection pool"""
+    global _async_http_client
+    if _async_http_client is None:
+        _async_http_client = anthropic.DefaultAsyncHttpxClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    return _async_http_client
+
 
 class AIGenerator:
     """Handles interactions with Anthropic's Claude API for generating responses"""
     
+    __slots__ = (
+        "client", "async_client", "model", "base_params",
+        "_cached_tools", "_cached_direct", "semantic_cache",
+    )
+    
     # Static system prompt to avoid rebuilding on each call
-    SYSTEM_PROMPT = """ You are an AI assistant specialized in course materials and educational content with access to comprehensive tools for course information.
+    SYSTEM_PROMPT = """You are an AI assistant specialized in course materials and educational content with access to comprehensive tools for course information.
 
 Tool Usage Guidelines:
 - **Sequential Tool Use**: You can use tools across multiple rounds to gather comprehensive information
 - **Maximum 2 tool rounds**: Plan your tool usage strategically within this limit
 - **Course Content Search**: Use for questions about specific course content or detailed educational materials
 - **Course Outline**: Use for questions about course structure, lesson lists, course overviews, or "what is covered in [course]"
-- **Tool Combination Strategy**: 
+- **Tool Combination Strategy**:
   - Round 1: Use outline tool to understand course structure, then search tool for specific content
   - Round 1: Use search tool with broad terms, then narrow down in Round 2
   - Choose the most efficient approach for each query
@@ -21,7 +63,7 @@ Tool Usage Guidelines:
 
 Tool Selection Strategy:
 - **Outline First**: When you need both structure AND content from a course
-- **Search First**: When you need specific content but course structure is less important  
+- **Search First**: When you need specific content but course structure is less important
 - **Iterative Refinement**: Use results from Round 1 to make more targeted Round 2 queries
 - **Outline queries**: Course structure, lesson breakdown, course overview, "what lessons are in...", "outline of..."
 - **Content queries**: Specific topics, detailed explanations, lesson-specific content
@@ -46,19 +88,67 @@ All responses must be:
 2. **Educational** - Maintain instructional value
 3. **Clear** - Use accessible language
 4. **Example-supported** - Include relevant examples when they aid understanding
-Provide only the direct answer to what was asked.
-"""
+Provide only the direct answer to what was asked."""
+    
+    # Cached prefix of the system parameter; must stay first and unchanged
+    SYSTEM_BLOCK = {
+        "type": "text",
+        "text": SYSTEM_PROMPT,
+        "cache_control": {"type": "ephemeral"}
+    }
+    
+    # Query count above which generate_response_batch uses the Message Batches API
+    BATCH_API_THRESHOLD = 10
+    # Seconds between Message Batches status polls
+    BATCH_POLL_INTERVAL = 5.0
     
     def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+        # SDK clients are cheap wrappers; the underlying connection pools are shared
+        self.client = anthropic.Anthropic(
+            api_key=api_key,
+            max_retries=MAX_RETRIES,
+            timeout=HTTP_TIMEOUT,
+            http_client=get_shared_http_client()
+        )
+        self.async_client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            max_retries=MAX_RETRIES,
+            timeout=HTTP_TIMEOUT,
+            http_client=get_shared_async_http_client()
+        )
         self.model = model
         
-        # Pre-build base API parameters
+        # Pre-build base API parameters (template copied for each call)
         self.base_params = {
             "model": self.model,
             "temperature": 0,
             "max_tokens": 800
         }
+        
+        # Snapshot of the last tools seen and their cache-marked copy
+        self._cached_tools = None
+        
+        # Memoized tool-less responses keyed by (query, conversation_history)
+        self._cached_direct = lru_cache(maxsize=512)(self._direct_response)
+        
+        # Opt-in cache for near-duplicate tool-less queries
+        self.semantic_cache: Optional[SemanticCache] = None
+    
+    def enable_semantic_cache(self, encoder=None, embedding_model: str = "all-MiniLM-L6-v2"):
+        """
+        Let near-duplicate tool-less queries reuse cached answers.
+        
+        Args:
+            encoder: Already-loaded SentenceTransformer to embed queries with,
+                     e.g. the vector store's, so no second copy is loaded
+            embedding_model: Model to load when no encoder is given
+        """
+        if self.semantic_cache is None:
+            self.semantic_cache = SemanticCache(embedding_model, encoder=encoder)
+    
+    def disable_semantic_cache(self):
+        """Drop the semantic cache and its answers"""
+        self.semantic_cache = None
     
     def generate_response(self, query: str,
                          conversation_history: Optional[str] = None,
@@ -79,13 +169,16 @@ Provide only the direct answer to what was asked.
             Generated response as string
         """
         
-        # Build initial system content and messages
-        system_content = self._build_system_content(conversation_history)
+        # Without executable tools the answer depends only on query and history
+        if not tools or tool_manager is None:
+            return self._cached_direct(query, conversation_history)
+        
+        # Build initial messages; history travels in the system blocks
         messages = [{"role": "user", "content": query}]
         
         # Tool calling loop - support sequential rounds
         for round_num in range(max_rounds):
-            response = self._make_api_call(messages, system_content, tools)
+            response = self._make_api_call(messages, conversation_history, tools)
             
             # Check if Claude wants to use tools
             if response.stop_reason != "tool_use":
@@ -93,97 +186,346 @@ Provide only the direct answer to what was asked.
                 return response.content[0].text
             
             # Execute tools and prepare for next round
-            if not tool_manager:
-                # No tool manager available - return text response if any
-                return response.content[0].text if response.content else "Tool execution not available"
+            self._execute_tools_and_update_messages(response, messages, tool_manager)
+        
+        # A tool_use turn that produced no tool results has nothing left for
+        # Claude to answer, so skip the extra round-trip
+        if messages[-1]["role"] == "assistant":
+            return response.content[0].text
+        
+        # Final API call after max rounds reached (without tools to force response)
+        final_response = self._make_api_call(messages, conversation_history, tools=None)
+        return final_response.content[0].text
+    
+    async def generate_response_async(self, query: str,
+                                      conversation_history: Optional[str] = None,
+                                      tools: Optional[List] = None,
+                                      tool_manager=None,
+                                      max_rounds: int = 2) -> str:
+        """
+        Async counterpart of generate_response using the async Anthropic client.
+        
+        Awaits Claude instead of blocking the event loop, and runs the
+        (blocking) tool executions on a bounded thread pool.
+        
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            max_rounds: Maximum tool calling rounds (default 2)
+            
+        Returns:
+            Generated response as string
+        """
+        # Without a tool manager Claude must answer directly
+        if tool_manager is None:
+            tools = None
+        
+        messages = [{"role": "user", "content": query}]
+        
+        for round_num in range(max_rounds):
+            response = await self._make_api_call_async(messages, conversation_history, tools)
+            
+            if response.stop_reason != "tool_use":
+                return response.content[0].text
             
-            messages = self._execute_tools_and_update_messages(
+            await self._execute_tools_and_update_messages_async(
                 response, messages, tool_manager
             )
         
-        # Final API call after max rounds reached (without tools to force response)
-        final_response = self._make_api_call(messages, system_content, tools=None)
+        if messages[-1]["role"] == "assistant":
+            return response.content[0].text
+        
+        final_response = await self._make_api_call_async(messages, conversation_history, tools=None)
         return final_response.content[0].text
     
-    def _build_system_content(self, conversation_history: Optional[str]) -> str:
+    async def generate_response_stream(self, query: str,
+                                       conversation_history: Optional[str] = None,
+                                       tools: Optional[List] = None,
+                                       tool_manager=None,
+                                       max_rounds: int = 2) -> AsyncIterator[str]:
         """
-        Build system content with conversation history if provided.
+        Stream the AI response as text chunks while Claude generates it.
+        
+        Follows the same tool loop as generate_response_async: text is
+        yielded as it arrives, and when a round ends in tool use the tools
+        are executed and the next round is streamed. After max_rounds a
+        final tools-disabled round forces an answer.
+        
+        Unlike the non-streaming paths, any text Claude writes before a tool
+        call (e.g. "Let me search...") has already been yielded by the time
+        the tool use is known, so it is part of the streamed answer.
         
         Args:
-            conversation_history: Previous conversation context
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            max_rounds: Maximum tool calling rounds (default 2)
+            
+        Yields:
+            Response text chunks
+        """
+        # Without a tool manager Claude must answer directly
+        if tool_manager is None:
+            tools = None
+        
+        messages = [{"role": "user", "content": query}]
+        
+        for round_num in range(max_rounds + 1):
+            round_tools = tools if round_num < max_rounds else None
+            api_params = self._build_api_params(messages, conversation_history, round_tools)
+            
+            async with self.async_client.messages.stream(**api_params) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                response = await stream.get_final_message()
+            
+            if response.stop_reason != "tool_use":
+                return
+            
+            await self._execute_tools_and_update_messages_async(
+                response, messages, tool_manager
+            )
+            if messages[-1]["role"] == "assistant":
+                return
+    
+    async def generate_response_batch(self, queries: List[str],
+                                      conversation_history: Optional[str] = None) -> List[str]:
+        """
+        Generate tool-less responses for many queries at once.
+        
+        Workloads larger than BATCH_API_THRESHOLD go through the Message
+        Batches API (half the cost, but results arrive asynchronously and are
+        polled for); smaller ones run concurrently on the async per-query
+        path. Every request carries the same cached system prompt block.
+        
+        Args:
+            queries: The questions to answer
+            conversation_history: Previous messages for context, shared by all queries
             
         Returns:
-            Complete system content string
+            Generated responses in the same order as queries
         """
-        if conversation_history:
-            return f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-        return self.SYSTEM_PROMPT
+        if len(queries) <= self.BATCH_API_THRESHOLD:
+            return list(await asyncio.gather(*(
+                self.generate_response_async(query, conversation_history)
+                for query in queries
+            )))
+        
+        batch = await self.async_client.messages.batches.create(requests=[
+            {
+                "custom_id": str(index),
+                "params": self._build_api_params(
+                    [{"role": "user", "content": query}], conversation_history
+                )
+            }
+            for index, query in enumerate(queries)
+        ])
+        while batch.processing_status != "ended":
+            await asyncio.sleep(self.BATCH_POLL_INTERVAL)
+            batch = await self.async_client.messages.batches.retrieve(batch.id)
+        
+        # Results arrive in arbitrary order; custom_id maps them back
+        responses = [""] * len(queries)
+        async for entry in await self.async_client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                responses[int(entry.custom_id)] = entry.result.message.content[0].text
+            else:
+                responses[int(entry.custom_id)] = f"Batch request failed: {entry.result.type}"
+        return responses
+    
+    def _direct_response(self, query: str, conversation_history: Optional[str]) -> str:
+        """Single tool-less API call; wrapped by the per-instance LRU cache"""
+        if not conversation_history:
+            if self.semantic_cache is None:
+                return self._fast_generate(query)
+            
+            # Answers are only shared between queries with no history
+            embedding = self.semantic_cache.embed(query)
+            answer = self.semantic_cache.get(embedding)
+            if answer is None:
+                answer = self._fast_generate(query)
+                self.semantic_cache.put(embedding, answer)
+            return answer
+        response = self._make_api_call(
+            [{"role": "user", "content": query}], conversation_history, tools=None
+        )
+        return response.content[0].text
+    
+    def _fast_generate(self, query: str) -> str:
+        """Straight-line call for the common no-tools, no-history case"""
+        response = self.client.messages.create(
+            **self.base_params,
+            system=[self.SYSTEM_BLOCK],
+            messages=[{"role": "user", "content": query}]
+        )
+        return response.content[0].text
+    
+    def clear_cache(self):
+        """Drop all memoized tool-less responses"""
+        self._cached_direct.cache_clear()
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
     
-    def _make_api_call(self, messages: List[Dict], system_content: str, 
+    def _make_api_call(self, messages: List[Dict],
+                       conversation_history: Optional[str] = None,
                        tools: Optional[List] = None):
         """
         Make API call to Claude with consistent parameters.
         
         Args:
             messages: Message history for the conversation
-            system_content: System prompt content
+            conversation_history: Previous conversation context
             tools: Available tools (None to disable tools)
             
         Returns:
             Claude API response
         """
-        api_params = {
-            **self.base_params,
-            "messages": messages,
-            "system": system_content
-        }
+        api_params = self._build_api_params(messages, conversation_history, tools)
+        return self.client.messages.create(**api_params)
+    
+    async def _make_api_call_async(self, messages: List[Dict],
+                                   conversation_history: Optional[str] = None,
+                                   tools: Optional[List] = None):
+        """Async counterpart of _make_api_call using the async client"""
+        api_params = self._build_api_params(messages, conversation_history, tools)
+        return await self.async_client.messages.create(**api_params)
+    
+    def _build_api_params(self, messages: List[Dict],
+                          conversation_history: Optional[str] = None,
+                          tools: Optional[List] = None) -> Dict[str, Any]:
+        """
+        Build the keyword arguments for a messages.create call.
+        
+        The static system prompt is sent as the first system block and marked
+        for prompt caching; conversation history follows as a separate block
+        so the cached prefix stays identical across calls.
+        
+        Args:
+            messages: Message history for the conversation
+            conversation_history: Previous conversation context
+            tools: Available tools (None to disable tools)
+            
+        Returns:
+            API parameters dict
+        """
+        system_blocks = [self.SYSTEM_BLOCK]
+        if conversation_history:
+            system_blocks.append({
+                "type": "text",
+                "text": f"Previous conversation:\n{conversation_history}"
+            })
+        
+        # Shallow copy of the pre-built template; only per-call keys are set
+        api_params = self.base_params.copy()
+        api_params["messages"] = messages
+        api_params["system"] = system_blocks
         
         if tools:
-            api_params["tools"] = tools
+            api_params["tools"] = self._get_cached_tools(tools)
             api_params["tool_choice"] = {"type": "auto"}
         
-        return self.client.messages.create(**api_params)
+        return api_params
+    
+    def _get_cached_tools(self, tools: List[Dict]) -> List[Dict]:
+        """
+        Return a copy of the tool definitions with a cache breakpoint on the last tool.
+        
+        Marking the last tool makes the whole tools block part of the cached
+        prompt prefix. The marked copy is reused while equal definitions are
+        passed in; they are compared against a deep snapshot, so changes the
+        caller makes to its list in place are picked up. The caller's list is
+        never modified.
+        
+        Args:
+            tools: Tool definitions to send to Claude
+            
+        Returns:
+            Tool definitions with cache_control set on the last entry
+        """
+        if self._cached_tools is None or self._cached_tools[0] != tools:
+            marked_tools = list(tools)
+            marked_tools[-1] = {**tools[-1], "cache_control": {"type": "ephemeral"}}
+            self._cached_tools = (copy.deepcopy(tools), marked_tools)
+        return self._cached_tools[1]
     
     def _execute_tools_and_update_messages(self, response, messages: List[Dict], 
-                                         tool_manager) -> List[Dict]:
+                                         tool_manager) -> None:
         """
         Execute tools and update message history for next round.
         
+        The messages list is mutated in place: the assistant tool use turn
+        and, if any tools ran, the user tool results turn are appended.
+        
         Args:
             response: Claude response containing tool use requests
-            messages: Current message history
+            messages: Current message history (mutated in place)
             tool_manager: Tool execution manager
-            
-        Returns:
-            Updated messages list with tool results
         """
-        # Add Claude's tool use response to messages
-        messages.append({"role": "assistant", "content": response.content})
+        # Add Claude's tool use turn to messages; only the tool_use blocks are
+        # needed to pair with the tool results, so text blocks are not re-sent
+        tool_blocks = [block for block in response.content if block.type == "tool_use"]
+        messages.append({"role": "assistant", "content": tool_blocks})
         
         # Execute all tool calls and collect results
-        tool_results = []
-        for content_block in response.content:
-            if content_block.type == "tool_use":
-                try:
-                    tool_result = tool_manager.execute_tool(
-                        content_block.name,
-                        **content_block.input
-                    )
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": content_block.id,
-                        "content": tool_result
-                    })
-                except Exception as e:
-                    # Handle tool execution errors gracefully
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": content_block.id,
-                        "content": f"Tool execution failed: {str(e)}"
-                    })
+        tool_results = [None] * len(tool_blocks)
+        for i, content_block in enumerate(tool_blocks):
+            try:
+                tool_result = tool_manager.execute_tool(
+                    content_block.name,
+                    **content_block.input
+                )
+            except Exception as e:
+                # Handle tool execution errors gracefully
+                tool_result = f"Tool execution failed: {str(e)}"
+            tool_results[i] = {
+                "type": "tool_result",
+                "tool_use_id": content_block.id,
+                "content": tool_result
+            }
         
         # Add tool results to messages
         if tool_results:
             messages.append({"role": "user", "content": tool_results})
+    
+    async def _execute_tools_and_update_messages_async(self, response, messages: List[Dict],
+                                                       tool_manager) -> None:
+        """
+        Async counterpart of _execute_tools_and_update_messages.
         
-        return messages
\ No newline at end of file
+        All tool calls from one round run concurrently on the bounded tool
+        pool (tool execution is blocking), so the round costs as much as the
+        slowest tool rather than the sum. A failing tool does not cancel
+        its siblings, and results keep the order of the tool_use blocks.
+        Like the sync version, messages is mutated in place.
+        """
+        tool_blocks = [block for block in response.content if block.type == "tool_use"]
+        messages.append({"role": "assistant", "content": tool_blocks})
+        
+        outcomes = await asyncio.gather(
+            *(self._run_tool(tool_manager, block.name, block.input) for block in tool_blocks),
+            return_exceptions=True
+        )
+        
+        tool_results = [None] * len(tool_blocks)
+        for i, (block, outcome) in enumerate(zip(tool_blocks, outcomes)):
+            if isinstance(outcome, Exception):
+                # Handle tool execution errors gracefully
+                outcome = f"Tool execution failed: {str(outcome)}"
+            tool_results[i] = {
+                "type": "tool_result",
+                "tool_use_id": block.id,
+                "content": outcome
+            }
+        
+        if tool_results:
+            messages.append({"role": "user", "content": tool_results})
+    
+    async def _run_tool(self, tool_manager, name: str, tool_input: Dict[str, Any]) -> str:
+        """Run one blocking tool call on the shared tool pool, which caps concurrency"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _TOOL_POOL, partial(tool_manager.execute_tool, name, **tool_input)
+        )
\ No newline at end of file
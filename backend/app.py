@@ -5,11 +5,16 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
 import os
 
 from config import config
+from models import (
+    ClearSessionRequest,
+    ClearSessionResponse,
+    CourseStats,
+    QueryRequest,
+    QueryResponse,
+)
 from rag_system import RAGSystem
 
 # Initialize FastAPI app
@@ -34,32 +39,6 @@ app.add_middleware(
 # Initialize RAG system
 rag_system = RAGSystem(config)
 
-# Pydantic models for request/response
-class QueryRequest(BaseModel):
-    """Request model for course queries"""
-    query: str
-    session_id: Optional[str] = None
-
-class QueryResponse(BaseModel):
-    """Response model for course queries"""
-    answer: str
-    sources: List[str]
-    session_id: str
-
-class CourseStats(BaseModel):
-    """Response model for course statistics"""
-    total_courses: int
-    course_titles: List[str]
-
-class ClearSessionRequest(BaseModel):
-    """Request model for clearing a session"""
-    session_id: str
-
-class ClearSessionResponse(BaseModel):
-    """Response model for clearing a session"""
-    success: bool
-    message: str
-
 # API Endpoints
 
 @app.post("/api/query", response_model=QueryResponse)
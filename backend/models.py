@@ -26,4 +26,39 @@ class CourseChunk(BaseModel):
     content: str  # The actual text content
     course_title: str  # Which course this chunk belongs to
     lesson_number: Optional[int] = None  # Which lesson this chunk is from
-    chunk_index: int  # Position of this chunk in the document
\ No newline at end of file
+    chunk_index: int  # Position of this chunk in the document
+
+
+class QueryRequest(BaseModel):
+    """Request model for course queries"""
+
+    query: str
+    session_id: Optional[str] = None
+
+
+class QueryResponse(BaseModel):
+    """Response model for course queries"""
+
+    answer: str
+    sources: List[str]
+    session_id: str
+
+
+class CourseStats(BaseModel):
+    """Response model for course statistics"""
+
+    total_courses: int
+    course_titles: List[str]
+
+
+class ClearSessionRequest(BaseModel):
+    """Request model for clearing a session"""
+
+    session_id: str
+
+
+class ClearSessionResponse(BaseModel):
+    """Response model for clearing a session"""
+
+    success: bool
+    message: str
@@ -141,6 +141,13 @@ class RAGSystem:
         # Return response with sources from tool searches
         return response, sources
     
+    def enable_semantic_cache(self):
+        """Serve near-duplicate queries from a semantic cache embedding with the vector store's model"""
+        self.ai_generator.enable_semantic_cache(
+            encoder=self.vector_store.encoder,
+            embedding_model=self.config.EMBEDDING_MODEL
+        )
+    
     def get_course_analytics(self) -> Dict:
         """Get analytics about the course catalog"""
         return {
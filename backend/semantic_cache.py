@@ -0,0 +1,79 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class SemanticCache:
+    """In-memory cache of query answers keyed by embedding similarity"""
+
+    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2",
+                 threshold: float = 0.92, max_entries: int = 10_000,
+                 encoder=None):
+        """
+        Args:
+            embedding_model: SentenceTransformer model used to embed queries
+            threshold: Minimum cosine similarity for a cached answer to be reused
+            max_entries: Entries kept before the least recently used is evicted
+            encoder: Preloaded model exposing SentenceTransformer's encode();
+                     loaded from embedding_model when not given
+        """
+        if encoder is None:
+            # Imported here so the opt-in cache adds no import cost when unused
+            from sentence_transformers import SentenceTransformer
+            encoder = SentenceTransformer(embedding_model)
+        self.encoder = encoder
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        # Row i of the matrix is the normalized embedding for answers[i];
+        # allocated on first put once the embedding size is known
+        self._matrix: Optional[np.ndarray] = None
+        self._answers: List[Optional[str]] = []
+        # Occupied rows, least recently used first
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def embed(self, query: str) -> np.ndarray:
+        """Embed a query as a unit vector so a dot product is cosine similarity"""
+        return self.encoder.encode(query, normalize_embeddings=True)
+
+    def get(self, embedding: np.ndarray) -> Optional[str]:
+        """Return the answer of the most similar cached query above the threshold"""
+        with self._lock:
+            if not self._lru:
+                return None
+
+            similarities = self._matrix[:len(self._answers)] @ embedding
+            row = int(np.argmax(similarities))
+            if similarities[row] < self.threshold:
+                return None
+
+            self._lru.move_to_end(row)
+            return self._answers[row]
+
+    def put(self, embedding: np.ndarray, answer: str):
+        """Cache an answer, evicting the least recently used entry when full"""
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+
+            if len(self._lru) >= self.max_entries:
+                row, _ = self._lru.popitem(last=False)
+            else:
+                row = len(self._answers)
+                self._answers.append(None)
+
+            self._matrix[row] = embedding
+            self._answers[row] = answer
+            self._lru[row] = None
+
+    def clear(self):
+        """Drop all cached answers"""
+        with self._lock:
+            self._matrix = None
+            self._answers.clear()
+            self._lru.clear()
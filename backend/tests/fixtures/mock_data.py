@@ -1,4 +1,10 @@
 """Mock data and utilities for testing"""
+import inspect
+from collections import deque
+from dataclasses import dataclass
+import numpy as np
+from types import MappingProxyType, SimpleNamespace
+from search_tools import Tool, CourseSearchTool, CourseOutlineTool
 
 # Sample course content chunks
 SAMPLE_COURSE_CHUNKS = [
@@ -25,24 +31,31 @@ SAMPLE_COURSE_METADATA = {
     "lessons_json": '[{"lesson_number": 0, "lesson_title": "Introduction", "lesson_link": "https://example.com/lesson0"}]'
 }
 
-# Test parameters for different scenarios
-TEST_PARAMETERS = {
-    "valid_kwargs": {
+# Test parameters for different scenarios, read-only so tests can share
+# the payloads without defensive copies
+TEST_PARAMETERS = MappingProxyType({
+    "valid_kwargs": MappingProxyType({
         "query": "What is MCP?",
-        "course_name": "MCP", 
+        "course_name": "MCP",
         "lesson_number": 1
-    },
-    "query_only": {
+    }),
+    "query_only": MappingProxyType({
         "query": "What is machine learning?"
-    },
-    "missing_query": {
+    }),
+    "missing_query": MappingProxyType({
         "course_name": "MCP",
         "lesson_number": 1
-    },
-    "empty_query": {
+    }),
+    "empty_query": MappingProxyType({
         "query": ""
-    }
-}
+    })
+})
+
+# execute() signatures of the tool interface and its implementations;
+# inspect.signature is costly, so build each one once at import
+TOOL_SIG = inspect.signature(Tool.execute)
+SEARCH_SIG = inspect.signature(CourseSearchTool.execute)
+OUTLINE_SIG = inspect.signature(CourseOutlineTool.execute)
 
 # Expected tool definitions
 EXPECTED_SEARCH_TOOL_DEF = {
@@ -57,4 +70,126 @@ EXPECTED_SEARCH_TOOL_DEF = {
         },
         "required": ["query"]
     }
-}
\ No newline at end of file
+}
+
+# Plain stand-ins for Anthropic message objects; tests only read their attributes
+@dataclass
+class ToolBlock:
+    type: str
+    name: str
+    id: str
+    input: dict
+
+
+@dataclass
+class TextBlock:
+    type: str
+    text: str
+
+
+@dataclass
+class Response:
+    stop_reason: str
+    content: list
+
+
+def make_tool_use_response(name, tool_id, input_dict):
+    """Anthropic response requesting a single tool call"""
+    return Response("tool_use", [ToolBlock("tool_use", name, tool_id, input_dict)])
+
+
+def make_stop_response(text):
+    """Anthropic response ending the turn with a text answer"""
+    return Response("stop", [TextBlock("text", text)])
+
+
+def canned_replies(pairs):
+    """Yield the responses of each (tool use, final) pair in order"""
+    for pair in pairs:
+        yield from pair
+
+
+class FakeMessages:
+    """Stand-in for client.messages: create() replays queued replies and records its kwargs
+
+    A queued exception is raised instead of returned, like a failed API call.
+    """
+
+    def __init__(self, replies=()):
+        self.calls = []
+        self._replies = deque(replies)
+
+    def queue(self, *replies):
+        """Queue replies for the next calls, in order"""
+        self._replies.extend(replies)
+
+    def reset(self):
+        """Drop queued replies and recorded calls"""
+        self._replies.clear()
+        self.calls.clear()
+
+    @property
+    def call_count(self):
+        return len(self.calls)
+
+    def _reply(self, kwargs):
+        self.calls.append(kwargs)
+        reply = self._replies.popleft()
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def create(self, **kwargs):
+        return self._reply(kwargs)
+
+
+class FakeAsyncMessages(FakeMessages):
+    """Async counterpart of FakeMessages; stream() replays queued FakeStreams"""
+
+    async def create(self, **kwargs):
+        return self._reply(kwargs)
+
+    def stream(self, **kwargs):
+        return self._reply(kwargs)
+
+
+class FakeStream:
+    """Stand-in for the messages.stream context manager: yields chunks, then the final message"""
+
+    def __init__(self, chunks, final_message):
+        self.chunks = chunks
+        self.final_message = final_message
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @property
+    async def text_stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def get_final_message(self):
+        return self.final_message
+
+
+def fake_anthropic(messages):
+    """Stand-in for an Anthropic client exposing only the given messages fake"""
+    return SimpleNamespace(messages=messages)
+
+
+class FakeEncoder:
+    """Encoder returning fixed unit vectors so similarities are known exactly"""
+
+    VECTORS = {
+        "What is MCP?": [1.0, 0.0, 0.0],
+        "What's MCP?": [0.98, 0.199, 0.0],
+        "What is FastAPI?": [0.0, 1.0, 0.0],
+        "What is Python?": [0.0, 0.0, 1.0],
+    }
+
+    def encode(self, text, normalize_embeddings=False):
+        vector = np.array(self.VECTORS[text], dtype=np.float32)
+        return vector / np.linalg.norm(vector)
@@ -1,18 +1,62 @@
 """Tests for AIGenerator tool calling mechanism"""
+import threading
 import pytest
-from unittest.mock import MagicMock, patch
-from tests.fixtures.mock_data import TEST_PARAMETERS
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from ai_generator import AIGenerator, HTTP_TIMEOUT, MAX_RETRIES
+from tests.fixtures.mock_data import (
+    TEST_PARAMETERS, FakeEncoder, FakeMessages, FakeAsyncMessages, FakeStream,
+    Response, TextBlock, ToolBlock, fake_anthropic, make_tool_use_response, make_stop_response,
+)
+
+
+# Canned responses for two tool rounds then a final answer, built once at import
+_ROUND1 = make_tool_use_response("get_course_outline", "tool_round1", {"course_title": "MCP"})
+_ROUND2 = make_tool_use_response(
+    "search_course_content", "tool_round2", {"query": "WebSockets", "course_name": "MCP"}
+)
+_FINAL = make_stop_response("MCP covers WebSockets in lesson 3.")
+_SEQ_RESPONSES = (_ROUND1, _ROUND2, _FINAL)
+
+_SEARCH_TOOL_USE = make_tool_use_response("search_course_content", "tool_123", {"query": "What is MCP?"})
+_MCP_ANSWER = make_stop_response("MCP is the Model Context Protocol.")
+_ML_ANSWER = make_stop_response("Machine learning is a subset of AI.")
+
+
+@pytest.fixture(scope="class")
+def ai_gen():
+    """One AIGenerator per test class, built against fake SDK clients"""
+    fake_client = fake_anthropic(FakeMessages())
+    fake_async_client = fake_anthropic(FakeAsyncMessages())
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("anthropic.Anthropic", lambda *args, **kwargs: fake_client)
+        mp.setattr("anthropic.AsyncAnthropic", lambda *args, **kwargs: fake_async_client)
+        return AIGenerator("test_key", "claude-3-sonnet-20240229")
 
 
 class TestAIGenerator:
     """Test AIGenerator tool calling functionality"""
     
-    def test_system_prompt_contains_tool_instructions(self):
+    @pytest.fixture(autouse=True)
+    def reset_ai_gen(self, ai_gen):
+        """Start each test with clean client fakes and empty response caches"""
+        ai_gen.client.messages.reset()
+        ai_gen.async_client.messages.reset()
+        ai_gen.clear_cache()
+        ai_gen.disable_semantic_cache()
+    
+    @pytest.fixture
+    def fake_messages(self, ai_gen):
+        """The shared generator's sync client.messages fake"""
+        return ai_gen.client.messages
+    
+    @pytest.fixture
+    def fake_async_messages(self, ai_gen):
+        """The shared generator's async client.messages fake"""
+        return ai_gen.async_client.messages
+    
+    def test_system_prompt_contains_tool_instructions(self, ai_gen):
         """Test that system prompt includes sequential tool usage guidelines"""
-        from ai_generator import AIGenerator
-        
-        ai_gen = AIGenerator("test_key", "claude-3-sonnet-20240229")
-        
         prompt = ai_gen.SYSTEM_PROMPT
         assert "Tool Usage Guidelines" in prompt
         assert "Course Content Search" in prompt
@@ -22,191 +66,225 @@ class TestAIGenerator:
         assert "Tool Combination Strategy" in prompt
         # Verify old restriction is removed
         assert "One tool call per query maximum" not in prompt
-        print("[PASS] System prompt contains sequential tool instructions")
+        # No stray whitespace is sent as tokens
+        assert prompt == prompt.strip()
+        assert all(line == line.rstrip() for line in prompt.splitlines())
     
-    @patch('anthropic.Anthropic')
-    def test_generate_response_without_tools(self, mock_anthropic_class):
-        """Test response generation without tool use"""
-        from ai_generator import AIGenerator
-        
-        # Setup mock
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-        
-        mock_response = MagicMock()
-        mock_response.stop_reason = "stop"
-        mock_text = MagicMock()
-        mock_text.text = "Machine learning is a subset of AI."
-        mock_response.content = [mock_text]
-        mock_client.messages.create.return_value = mock_response
-        
-        # Test
-        ai_gen = AIGenerator("test_key", "claude-3-sonnet-20240229")
-        response = ai_gen.generate_response("What is machine learning?")
-        
-        assert isinstance(response, str)
-        assert "machine learning" in response.lower()
-        
-        # Verify no tools were passed
-        call_args = mock_client.messages.create.call_args[1]
-        assert "tools" not in call_args
-        
-        print(f"[PASS] No-tool response: {response}")
+    @pytest.mark.parametrize("responses,expected_calls,expected_substr,use_tools,max_rounds", [
+        # No tools: a single tool-less call
+        ((_ML_ANSWER,), 1, "Machine learning is a subset of AI", False, 2),
+        # Tool use then a direct answer (backward compatibility)
+        ((_SEARCH_TOOL_USE, _MCP_ANSWER), 2, "MCP is the Model Context Protocol", True, 2),
+        # Two tool rounds then the forced final answer
+        (_SEQ_RESPONSES, 3, "MCP covers WebSockets", True, 2),
+        # A single allowed round forces the final answer after the first tool use
+        ((_SEARCH_TOOL_USE, _MCP_ANSWER), 2, "MCP is the Model Context Protocol", True, 1),
+        # Claude answers directly although tools are available
+        ((_ML_ANSWER,), 1, "Machine learning is a subset of AI", True, 2),
+    ], ids=["without_tools", "single_round_tool_use", "sequential_two_rounds", "forced_final_after_one_round", "early_termination"])
+    def test_generate_response(self, ai_gen, fake_messages, tool_manager, tool_definitions,
+                               responses, expected_calls, expected_substr, use_tools, max_rounds):
+        """Test response generation across the tool calling paths"""
+        fake_messages.queue(*responses)
+        
+        if use_tools:
+            response = ai_gen.generate_response(
+                "What is MCP?",
+                tools=tool_definitions,
+                tool_manager=tool_manager,
+                max_rounds=max_rounds
+            )
+        else:
+            response = ai_gen.generate_response("What is MCP?")
+        
+        assert fake_messages.call_count == expected_calls
+        assert expected_substr in response
+        # Calls past max_rounds are the forced final answer, sent without tools
+        assert ("tools" in fake_messages.calls[-1]) == (use_tools and expected_calls <= max_rounds)
     
-    @patch('anthropic.Anthropic')
-    def test_generate_response_single_round_tool_use(self, mock_anthropic_class, tool_manager):
-        """Test single round tool use (backward compatibility)"""
-        from ai_generator import AIGenerator
-        
-        # Setup mock Anthropic client
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-        
-        # Mock tool use response then direct response
-        mock_tool_response = MagicMock()
-        mock_tool_response.stop_reason = "tool_use"
-        mock_tool_block = MagicMock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.name = "search_course_content"
-        mock_tool_block.id = "tool_123"
-        mock_tool_block.input = {"query": "What is MCP?"}
-        mock_tool_response.content = [mock_tool_block]
-        
-        # Mock final response after tool execution
-        mock_final_response = MagicMock()
-        mock_final_response.stop_reason = "stop"
-        mock_final_text = MagicMock()
-        mock_final_text.text = "MCP is the Model Context Protocol."
-        mock_final_response.content = [mock_final_text]
-        
-        mock_client.messages.create.side_effect = [mock_tool_response, mock_final_response]
-        
-        ai_gen = AIGenerator("test_key", "claude-3-sonnet-20240229")
+    def test_generate_response_without_tools_is_memoized(self, ai_gen, fake_messages):
+        """Test that identical tool-less queries are served from the LRU cache"""
+        fake_messages.queue(*[_ML_ANSWER] * 3)
+
+        first = ai_gen.generate_response("What is machine learning?")
+        second = ai_gen.generate_response("What is machine learning?")
+
+        assert first == second
+        assert fake_messages.call_count == 1
+
+        # No history: only the cached system block, no tools
+        fast_call = fake_messages.calls[-1]
+        assert fast_call["system"] == [AIGenerator.SYSTEM_BLOCK]
+        assert "tools" not in fast_call
+
+        # Different history is a different cache key
+        ai_gen.generate_response("What is machine learning?", conversation_history="User: Hi")
+        assert fake_messages.call_count == 2
+
+        ai_gen.clear_cache()
+        ai_gen.generate_response("What is machine learning?")
+        assert fake_messages.call_count == 3
+
+    def test_semantic_cache_serves_near_duplicate_queries(self, ai_gen, fake_messages):
+        """Test that an opted-in semantic cache answers paraphrased queries"""
+        fake_messages.queue(_MCP_ANSWER)
+
+        assert ai_gen.semantic_cache is None
+        encoder = FakeEncoder()
+        ai_gen.enable_semantic_cache(encoder=encoder)
+        assert ai_gen.semantic_cache.encoder is encoder
+
+        first = ai_gen.generate_response("What is MCP?")
+        second = ai_gen.generate_response("What's MCP?")
+
+        assert first == second
+        assert fake_messages.call_count == 1
+
+        ai_gen.disable_semantic_cache()
+        assert ai_gen.semantic_cache is None
+
+    def test_generate_response_skips_final_call_without_tool_results(self, ai_gen, fake_messages, tool_manager, tool_definitions):
+        """Test that no forced final call is made when a tool_use turn has no tool calls"""
+        fake_messages.queue(Response("tool_use", [TextBlock("text", "MCP is the Model Context Protocol.")]))
+
         response = ai_gen.generate_response(
             "What is MCP?",
-            tools=tool_manager.get_tool_definitions(),
-            tool_manager=tool_manager
-        )
-        
-        # Verify two API calls were made (tool use + final response)
-        assert mock_client.messages.create.call_count == 2
-        assert "MCP is the Model Context Protocol" in response
-        print(f"[PASS] Single round tool use: {response}")
-    
-    @patch('anthropic.Anthropic')
-    def test_generate_response_sequential_two_rounds(self, mock_anthropic_class, tool_manager):
-        """Test sequential tool calling with two rounds"""
-        from ai_generator import AIGenerator
-        
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-        
-        # Mock Round 1: tool use
-        mock_round1_response = MagicMock()
-        mock_round1_response.stop_reason = "tool_use"
-        mock_tool_block1 = MagicMock()
-        mock_tool_block1.type = "tool_use"
-        mock_tool_block1.name = "get_course_outline"
-        mock_tool_block1.id = "tool_round1"
-        mock_tool_block1.input = {"course_title": "MCP"}
-        mock_round1_response.content = [mock_tool_block1]
-        
-        # Mock Round 2: tool use again
-        mock_round2_response = MagicMock()
-        mock_round2_response.stop_reason = "tool_use"
-        mock_tool_block2 = MagicMock()
-        mock_tool_block2.type = "tool_use"
-        mock_tool_block2.name = "search_course_content"
-        mock_tool_block2.id = "tool_round2"
-        mock_tool_block2.input = {"query": "WebSockets", "course_name": "MCP"}
-        mock_round2_response.content = [mock_tool_block2]
-        
-        # Mock final response (after max rounds)
-        mock_final_response = MagicMock()
-        mock_final_response.stop_reason = "stop"
-        mock_final_text = MagicMock()
-        mock_final_text.text = "MCP covers WebSockets in lesson 3."
-        mock_final_response.content = [mock_final_text]
-        
-        mock_client.messages.create.side_effect = [mock_round1_response, mock_round2_response, mock_final_response]
-        
-        ai_gen = AIGenerator("test_key", "claude-3-sonnet-20240229")
-        response = ai_gen.generate_response(
-            "What does the MCP course cover about WebSockets?",
-            tools=tool_manager.get_tool_definitions(),
+            tools=tool_definitions,
             tool_manager=tool_manager,
-            max_rounds=2
+            max_rounds=1
         )
-        
-        # Verify three API calls were made (round1 + round2 + final)
-        assert mock_client.messages.create.call_count == 3
-        assert "MCP covers WebSockets" in response
-        print(f"[PASS] Two round tool use: {response}")
-    
-    @patch('anthropic.Anthropic')
-    def test_generate_response_early_termination(self, mock_anthropic_class, tool_manager):
-        """Test early termination when Claude provides direct response"""
-        from ai_generator import AIGenerator
-        
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-        
-        # Mock direct response (no tool use)
-        mock_direct_response = MagicMock()
-        mock_direct_response.stop_reason = "stop"
-        mock_direct_text = MagicMock()
-        mock_direct_text.text = "Machine learning is a subset of AI."
-        mock_direct_response.content = [mock_direct_text]
-        
-        mock_client.messages.create.return_value = mock_direct_response
-        
-        ai_gen = AIGenerator("test_key", "claude-3-sonnet-20240229")
-        response = ai_gen.generate_response(
-            "What is machine learning?",
-            tools=tool_manager.get_tool_definitions(),
-            tool_manager=tool_manager,
-            max_rounds=2
-        )
-        
-        # Verify only one API call was made (direct response)
-        assert mock_client.messages.create.call_count == 1
-        assert "Machine learning is a subset of AI" in response
-        print(f"[PASS] Early termination: {response}")
-    
-    @patch('anthropic.Anthropic')
-    def test_helper_methods(self, mock_anthropic_class):
+
+        assert fake_messages.call_count == 1
+        assert response == "MCP is the Model Context Protocol."
+
+    def test_helper_methods(self, ai_gen, fake_messages):
         """Test the new helper methods"""
-        from ai_generator import AIGenerator
-        
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-        
+        # Responses are not inspected here
+        fake_messages.queue(_FINAL, _FINAL)
+
+        # Test _make_api_call system blocks without history
+        ai_gen._make_api_call([{"role": "user", "content": "Hi"}])
+        system_blocks = fake_messages.calls[-1]["system"]
+        assert len(system_blocks) == 1
+        assert system_blocks[0]["text"] == ai_gen.SYSTEM_PROMPT
+        assert system_blocks[0]["cache_control"] == {"type": "ephemeral"}
+
+        # History goes into a separate block after the cached prompt
+        ai_gen._make_api_call([{"role": "user", "content": "Hi"}], "Previous: Hello")
+        system_blocks = fake_messages.calls[-1]["system"]
+        assert len(system_blocks) == 2
+        assert system_blocks[0]["text"] == ai_gen.SYSTEM_PROMPT
+        assert "Previous conversation:" in system_blocks[1]["text"]
+        assert "Previous: Hello" in system_blocks[1]["text"]
+        assert "cache_control" not in system_blocks[1]
+
+        # The cached prefix block is the same object regardless of history
+        first_block = fake_messages.calls[0]["system"][0]
+        assert system_blocks[0] is first_block is AIGenerator.SYSTEM_BLOCK
+
+    def test_tools_cache_breakpoint(self, ai_gen, fake_messages, tool_definitions):
+        """Test that the last tool definition is marked for prompt caching"""
+        fake_messages.queue(_FINAL, _FINAL)
+        tools = tool_definitions
+
+        ai_gen._make_api_call([{"role": "user", "content": "Hi"}], tools=tools)
+        sent_tools = fake_messages.calls[-1]["tools"]
+        assert sent_tools[-1]["cache_control"] == {"type": "ephemeral"}
+        assert all("cache_control" not in tool for tool in sent_tools[:-1])
+
+        # Caller's definitions are left untouched
+        assert all("cache_control" not in tool for tool in tools)
+
+        # Marked copy is reused for the same definitions
+        ai_gen._make_api_call([{"role": "user", "content": "Hi"}], tools=tools)
+        assert fake_messages.calls[-1]["tools"] is sent_tools
+
+    def test_tools_cache_tracks_in_place_changes(self, ai_gen, fake_messages, tool_definitions):
+        """Test that changing the same tools list in place rebuilds the marked copy"""
+        fake_messages.queue(_FINAL, _FINAL, _FINAL)
+        tools = [dict(tool) for tool in tool_definitions[:1]]
+
+        ai_gen._make_api_call([{"role": "user", "content": "Hi"}], tools=tools)
+        assert [tool["name"] for tool in fake_messages.calls[-1]["tools"]] == [tools[0]["name"]]
+
+        # Appending to the same list is seen despite the list still equalling itself
+        tools.append(dict(tool_definitions[1]))
+        ai_gen._make_api_call([{"role": "user", "content": "Hi"}], tools=tools)
+        sent_tools = fake_messages.calls[-1]["tools"]
+        assert [tool["name"] for tool in sent_tools] == [tool["name"] for tool in tools]
+        assert sent_tools[-1]["cache_control"] == {"type": "ephemeral"}
+        assert "cache_control" not in sent_tools[0]
+
+        # So is a nested change to the last definition
+        tools[-1]["description"] = "Changed description"
+        ai_gen._make_api_call([{"role": "user", "content": "Hi"}], tools=tools)
+        assert fake_messages.calls[-1]["tools"][-1]["description"] == "Changed description"
+
+    def test_instances_share_connection_pool(self):
+        """Test that generators reuse one HTTP connection pool"""
+        ai_gen1 = AIGenerator("test_key", "claude-3-sonnet-20240229")
+        ai_gen2 = AIGenerator("other_key", "claude-3-sonnet-20240229")
+
+        assert ai_gen1.client._client is ai_gen2.client._client
+        assert ai_gen1.async_client._client is ai_gen2.async_client._client
+
+    def test_instances_use_slots(self):
+        """Test that AIGenerator rejects attributes outside its slots"""
         ai_gen = AIGenerator("test_key", "claude-3-sonnet-20240229")
-        
-        # Test _build_system_content
-        system_content = ai_gen._build_system_content(None)
-        assert system_content == ai_gen.SYSTEM_PROMPT
-        
-        system_content_with_history = ai_gen._build_system_content("Previous: Hello")
-        assert "Previous conversation:" in system_content_with_history
-        assert "Previous: Hello" in system_content_with_history
-        
-        print("[PASS] Helper methods work correctly")
-    
-    def test_tool_parameter_extraction_and_error_handling(self):
+
+        assert not hasattr(ai_gen, "__dict__")
+        with pytest.raises(AttributeError):
+            ai_gen.modle = "typo"
+
+    def test_clients_retry_transient_errors(self):
+        """Test that both SDK clients are configured to retry failed calls"""
+        ai_gen = AIGenerator("test_key", "claude-3-sonnet-20240229")
+
+        for client in (ai_gen.client, ai_gen.async_client):
+            assert client.max_retries == MAX_RETRIES
+            assert client.timeout == HTTP_TIMEOUT
+
+    async def test_generate_response_async_tool_use(self, ai_gen, fake_async_messages, tool_manager, tool_definitions):
+        """Test async response generation with a tool round"""
+
+        fake_async_messages.queue(_SEARCH_TOOL_USE, _MCP_ANSWER)
+
+        response = await ai_gen.generate_response_async(
+            "What is MCP?",
+            tools=tool_definitions,
+            tool_manager=tool_manager
+        )
+
+        assert fake_async_messages.call_count == 2
+        assert "MCP is the Model Context Protocol" in response
+
+        # Tool result was fed back to Claude on the second call
+        messages = fake_async_messages.calls[-1]["messages"]
+        assert messages[-1]["content"][0]["tool_use_id"] == "tool_123"
+
+    async def test_generate_response_async_without_tool_manager(self, ai_gen, fake_async_messages, tool_definitions):
+        """Test that tools are not offered to Claude when nothing can execute them"""
+        fake_async_messages.queue(_MCP_ANSWER)
+
+        response = await ai_gen.generate_response_async("What is MCP?", tools=tool_definitions)
+
+        assert response == "MCP is the Model Context Protocol."
+        assert fake_async_messages.call_count == 1
+        assert "tools" not in fake_async_messages.calls[-1]
+
+    def test_tool_parameter_extraction_and_error_handling(self, ai_gen):
         """Test parameter extraction and error handling in sequential calling"""
-        from ai_generator import AIGenerator
-        
         # Mock a tool use content block like Anthropic would send
-        mock_tool_block = MagicMock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.name = "search_course_content"
-        mock_tool_block.id = "test_id"
-        mock_tool_block.input = {
-            "query": "What is MCP?",
-            "course_name": "MCP Course",
-            "lesson_number": 1
-        }
+        mock_tool_block = ToolBlock(
+            type="tool_use",
+            name="search_course_content",
+            id="test_id",
+            input={
+                "query": "What is MCP?",
+                "course_name": "MCP Course",
+                "lesson_number": 1
+            }
+        )
         
         # Test parameter extraction
         params = mock_tool_block.input
@@ -215,49 +293,144 @@ class TestAIGenerator:
         assert params["query"] == "What is MCP?"
         
         # Test error handling in _execute_tools_and_update_messages
-        ai_gen = AIGenerator("test_key", "claude-3-sonnet-20240229")
-        
         # Mock response with tool use
-        mock_response = MagicMock()
-        mock_response.content = [mock_tool_block]
+        mock_response = Response("tool_use", [mock_tool_block])
         
         # Mock tool manager that raises exception
-        mock_tool_manager = MagicMock()
+        mock_tool_manager = MagicMock(spec_set=["execute_tool"])
         mock_tool_manager.execute_tool.side_effect = Exception("Tool failed")
         
         messages = [{"role": "user", "content": "test"}]
         
         # Should handle error gracefully
-        result_messages = ai_gen._execute_tools_and_update_messages(
+        result = ai_gen._execute_tools_and_update_messages(
             mock_response, messages, mock_tool_manager
         )
         
-        # Should have added assistant message and error result
-        assert len(result_messages) == 3  # original + assistant + tool_result
-        tool_result_message = result_messages[2]
+        # Should have added assistant message and error result in place
+        assert result is None
+        assert len(messages) == 3  # original + assistant + tool_result
+        tool_result_message = messages[2]
         assert tool_result_message["role"] == "user"
         assert "Tool execution failed" in str(tool_result_message["content"])
-        
-        print("[PASS] Parameter extraction and error handling work correctly")
+
+    async def test_async_tools_run_concurrently_and_isolate_errors(self, ai_gen):
+        """Test that one round's tool calls run together and failures stay per-tool"""
+        # Both tools must be running at once to get past the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        thread_names = []
+
+        def execute_tool(name, **kwargs):
+            thread_names.append(threading.current_thread().name)
+            barrier.wait()
+            if name == "broken_tool":
+                raise Exception("Tool failed")
+            return f"{name} result"
+
+        mock_tool_manager = MagicMock(spec_set=["execute_tool"])
+        mock_tool_manager.execute_tool.side_effect = execute_tool
+
+        blocks = [
+            ToolBlock("tool_use", name, tool_id, {"query": "test"})
+            for tool_id, name in [("id_1", "search_course_content"), ("id_2", "broken_tool")]
+        ]
+        text_block = TextBlock("text", "Let me search for that.")
+        mock_response = Response("tool_use", [text_block] + blocks)
+
+        messages = [{"role": "user", "content": "test"}]
+        await ai_gen._execute_tools_and_update_messages_async(
+            mock_response, messages, mock_tool_manager
+        )
+
+        # Only the tool_use blocks are sent back in the assistant turn
+        assert messages[1]["content"] == blocks
+
+        tool_results = messages[-1]["content"]
+        assert [result["tool_use_id"] for result in tool_results] == ["id_1", "id_2"]
+        assert tool_results[0]["content"] == "search_course_content result"
+        assert "Tool execution failed: Tool failed" in tool_results[1]["content"]
+
+        # Tools ran on the bounded tool pool
+        assert all(name.startswith("tool") for name in thread_names)
+
+    async def test_generate_response_stream_with_tool_round(self, ai_gen, fake_async_messages, tool_manager, tool_definitions):
+        """Test streaming text chunks across a tool round"""
+        fake_async_messages.queue(
+            FakeStream([], _SEARCH_TOOL_USE),
+            FakeStream(["MCP is ", "the Model Context Protocol."], _MCP_ANSWER),
+        )
+
+        chunks = [
+            chunk async for chunk in ai_gen.generate_response_stream(
+                "What is MCP?",
+                tools=tool_definitions,
+                tool_manager=tool_manager
+            )
+        ]
+
+        assert chunks == ["MCP is ", "the Model Context Protocol."]
+        assert fake_async_messages.call_count == 2
+        second_call = fake_async_messages.calls[-1]
+        assert second_call["messages"][-1]["content"][0]["tool_use_id"] == "tool_123"
+
+    async def test_generate_response_stream_without_tool_manager(self, ai_gen, fake_async_messages, tool_definitions):
+        """Test that streaming offers no tools when nothing can execute them"""
+        fake_async_messages.queue(FakeStream(["MCP is the Model Context Protocol."], _MCP_ANSWER))
+
+        chunks = [
+            chunk async for chunk in ai_gen.generate_response_stream("What is MCP?", tools=tool_definitions)
+        ]
+
+        assert chunks == ["MCP is the Model Context Protocol."]
+        assert fake_async_messages.call_count == 1
+        assert "tools" not in fake_async_messages.calls[-1]
+
+    async def test_generate_response_batch_uses_batches_api(self, ai_gen, fake_async_messages, monkeypatch):
+        """Test that large batches go through the Message Batches API in input order"""
+        queries = ["Q0", "Q1", "Q2"]
+
+        def make_entry(custom_id, text=None):
+            if text is None:
+                result = SimpleNamespace(type="errored")
+            else:
+                result = SimpleNamespace(type="succeeded", message=make_stop_response(text))
+            return SimpleNamespace(custom_id=custom_id, result=result)
+
+        async def results():
+            # Out of order on purpose
+            for entry in [make_entry("2", "A2"), make_entry("0", "A0"), make_entry("1")]:
+                yield entry
+
+        pending = SimpleNamespace(id="batch_1", processing_status="in_progress")
+        ended = SimpleNamespace(id="batch_1", processing_status="ended")
+        batches = MagicMock(spec_set=["create", "retrieve", "results"])
+        batches.create = AsyncMock(return_value=pending)
+        batches.retrieve = AsyncMock(return_value=ended)
+        batches.results = AsyncMock(return_value=results())
+        monkeypatch.setattr(fake_async_messages, "batches", batches, raising=False)
+
+        monkeypatch.setattr(AIGenerator, "BATCH_API_THRESHOLD", 2)
+        monkeypatch.setattr(AIGenerator, "BATCH_POLL_INTERVAL", 0)
+        responses = await ai_gen.generate_response_batch(queries)
+
+        assert responses == ["A0", "Batch request failed: errored", "A2"]
+        requests = batches.create.call_args[1]["requests"]
+        assert [request["custom_id"] for request in requests] == ["0", "1", "2"]
+        assert all(
+            request["params"]["system"][0]["cache_control"] == {"type": "ephemeral"}
+            for request in requests
+        )
+        batches.retrieve.assert_awaited_once_with("batch_1")
 
 
 def test_sequential_tool_calling_integration(tool_manager):
-    """Test that sequential tool calling works with actual tool manager"""
-    
-    # Test both tools work individually
-    try:
-        outline_result = tool_manager.execute_tool("get_course_outline", course_title="MCP")
-        print(f"[WORKING] CourseOutlineTool: {outline_result[:50]}...")
-    except Exception as e:
-        print(f"[ERROR] CourseOutlineTool failed: {e}")
-    
-    try:
-        search_result = tool_manager.execute_tool("search_course_content", **TEST_PARAMETERS["valid_kwargs"])
-        print(f"[WORKING] CourseSearchTool: {search_result[:50]}...")
-    except Exception as e:
-        print(f"[ERROR] CourseSearchTool failed: {e}")
+    """Test that both tools used for sequential calling work with the actual tool manager"""
+    outline_result = tool_manager.execute_tool("get_course_outline", course_title="MCP")
+    assert isinstance(outline_result, str)
     
-    print("[INFO] Both tools should work for sequential calling")
+    search_result = tool_manager.execute_tool("search_course_content", **TEST_PARAMETERS["valid_kwargs"])
+    assert isinstance(search_result, str)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+"""Tests for SemanticCache similarity lookup and eviction"""
+import pytest
+from semantic_cache import SemanticCache
+from tests.fixtures.mock_data import FakeEncoder
+
+
+class TestSemanticCache:
+    """Test SemanticCache behavior with a deterministic encoder"""
+
+    @pytest.fixture
+    def cache(self):
+        """Small cache so eviction is easy to trigger"""
+        return SemanticCache(max_entries=2, encoder=FakeEncoder())
+
+    def test_near_duplicate_query_hits(self, cache):
+        """Test that a paraphrased query reuses the cached answer"""
+        cache.put(cache.embed("What is MCP?"), "MCP is the Model Context Protocol.")
+
+        assert cache.get(cache.embed("What's MCP?")) == "MCP is the Model Context Protocol."
+        assert cache.get(cache.embed("What is FastAPI?")) is None
+
+    def test_least_recently_used_entry_is_evicted(self, cache):
+        """Test that the LRU entry is evicted once the cache is full"""
+        cache.put(cache.embed("What is MCP?"), "MCP answer")
+        cache.put(cache.embed("What is FastAPI?"), "FastAPI answer")
+
+        # Touch MCP so FastAPI becomes the least recently used entry
+        assert cache.get(cache.embed("What is MCP?")) == "MCP answer"
+        cache.put(cache.embed("What is Python?"), "Python answer")
+
+        assert len(cache) == 2
+        assert cache.get(cache.embed("What is FastAPI?")) is None
+        assert cache.get(cache.embed("What is MCP?")) == "MCP answer"
+        assert cache.get(cache.embed("What is Python?")) == "Python answer"
+
+    def test_clear_empties_cache(self, cache):
+        """Test that clear drops every entry"""
+        cache.put(cache.embed("What is MCP?"), "MCP answer")
+        cache.clear()
+
+        assert len(cache) == 0
+        assert cache.get(cache.embed("What is MCP?")) is None
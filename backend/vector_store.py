@@ -3,7 +3,6 @@ from chromadb.config import Settings
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from models import Course, CourseChunk
-from sentence_transformers import SentenceTransformer
 
 @dataclass
 class SearchResults:
@@ -51,6 +50,11 @@ class VectorStore:
         self.course_catalog = self._create_collection("course_catalog")  # Course titles/instructors
         self.course_content = self._create_collection("course_content")  # Actual course material
     
+    @property
+    def encoder(self):
+        """The SentenceTransformer loaded for the embedding function, for reuse elsewhere"""
+        return self.embedding_function.models[self.embedding_function.model_name]
+    
     def _create_collection(self, name: str):
         """Create or get a ChromaDB collection"""
         return self.client.get_or_create_collection(